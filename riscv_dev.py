@@ -7,11 +7,15 @@ Only creates build artifacts - no source files or user configurations.
 Usage:
     python3 riscv_dev.py install
     python3 riscv_dev.py build [--debug]
+    python3 riscv_dev.py watch [--debug]
     python3 riscv_dev.py run [--debug]
 """
 
 import argparse
+import asyncio
+import hashlib
 import os
+import re
 import sys
 import subprocess
 import urllib.request
@@ -22,11 +26,212 @@ import time
 import json
 from pathlib import Path
 
+try:
+    # Optional: python-xz decodes the blocks of a multi-stream xz archive in
+    # parallel, where stdlib lzma is single-threaded
+    import xz
+except ImportError:
+    xz = None
+
+# Debug-script bodies, built once at import instead of per call
+_GDB_TEMPLATE = """
+# GDB script for RISC-V boot chain debugging
+target remote localhost:1234
+
+# Load symbols from build/bin/
+symbol-file {bin_dir}/bios.elf
+add-symbol-file {bin_dir}/stage1_bootloader.elf 0x80000000
+add-symbol-file {bin_dir}/stage2_bootloader.elf 0x80100000
+add-symbol-file {bin_dir}/kernel.elf 0x80200000
+
+# Set breakpoints at key locations
+break *0x1000        # BIOS entry
+break *0x80000000    # Stage-1 bootloader entry
+break *0x80100000    # Stage-2 bootloader entry
+break *0x80200000    # Kernel entry
+
+# Set breakpoints at symbolic locations (if debug symbols exist)
+break stage2_entry
+break stage2_sbi_call
+break stage2_kernel_jump
+
+# Custom debugging commands
+define show-boot-state
+    printf "=== Boot State Debug ===\\n"
+    printf "PC: 0x%016lx\\n", $pc
+    printf "SP: 0x%016lx\\n", $sp
+    printf "mstatus: 0x%016lx\\n", $mstatus
+    if ($pc >= 0x1000) && ($pc < 0x80000000)
+        printf "Current stage: BIOS\\n"
+    end
+    if ($pc >= 0x80000000) && ($pc < 0x80100000)
+        printf "Current stage: Stage-1 Bootloader\\n"
+    end
+    if ($pc >= 0x80100000) && ($pc < 0x80200000)
+        printf "Current stage: Stage-2 Bootloader\\n"
+    end
+    if ($pc >= 0x80200000)
+        printf "Current stage: Kernel\\n"
+    end
+    printf "========================\\n"
+end
+
+define step-boot
+    stepi
+    show-boot-state
+end
+
+# Enable useful debugging features
+set disassemble-next-line on
+set print pretty on
+set confirm off
+
+# Print startup message
+echo \\n=== RISC-V Boot Chain Debugger ===\\n
+echo Available commands:\\n
+echo   show-boot-state : Show current boot state\\n
+echo   step-boot      : Step one instruction and show state\\n
+echo   continue       : Continue execution\\n
+echo ===================================\\n\\n
+"""
+
+_TRACE_TEMPLATE = '''#!/usr/bin/env python3
+"""
+QEMU Trace Analysis Script for RISC-V Boot Chain
+Analyzes QEMU execution logs to provide boot sequence insights
+"""
+
+import mmap
+import re
+import sys
+from bisect import bisect_right
+
+# Half-open [start, end) address ranges for each boot stage
+STAGE_RANGES = [
+    (0x1000, 0x80000000, "BIOS"),
+    (0x80000000, 0x80100000, "Stage-1 Bootloader"),
+    (0x80100000, 0x80200000, "Stage-2 Bootloader"),
+    (0x80200000, 1 << 64, "Kernel")
+]
+STAGE_STARTS = [start for start, _end, _name in STAGE_RANGES]
+
+# Notable (rare) events still go through a regex; translated-block
+# addresses are found with the mm.find loop below, which probes the
+# fixed-width marker in C with zero allocation per miss
+EVENTS = re.compile(
+    rb"(?P<mem>load|store)|(?P<exc>exception)|(?P<intr>interrupt)",
+    re.IGNORECASE
+)
+
+IN_MARKER = b"IN: 0x"
+
+def stage_index(addr):
+    """Bisect an address into STAGE_RANGES; returns the index or -1"""
+    i = bisect_right(STAGE_STARTS, addr) - 1
+    if i >= 0 and addr < STAGE_RANGES[i][1]:
+        return i
+    return -1
+
+def line_at(mm, pos):
+    """Return the text of the log line containing byte offset pos"""
+    start = mm.rfind(b"\\n", 0, pos) + 1
+    end = mm.find(b"\\n", pos)
+    if end < 0:
+        end = len(mm)
+    return mm[start:end].decode(errors="replace").strip()
+
+def analyze_boot_sequence(logfile):
+    print("=== RISC-V Boot Sequence Analysis ===\\n")
+
+    current_stage = None
+    instruction_count = 0
+    memory_accesses = 0
+    exceptions = 0
+
+    def stage_summary():
+        print(f"  Instructions executed: {instruction_count}")
+        print(f"  Memory accesses: {memory_accesses}")
+        if exceptions:
+            print(f"  Exceptions: {exceptions}")
+        print()
+
+    def handle_event(m):
+        nonlocal memory_accesses, exceptions
+        if current_stage is None:
+            return
+        if m['mem'] is not None:
+            memory_accesses += 1
+        elif m['exc'] is not None:
+            exceptions += 1
+            print(f"  ⚠️  Exception in {current_stage}: {line_at(mm, m.start())}")
+        else:
+            print(f"  📶 Interrupt in {current_stage}: {line_at(mm, m.start())}")
+
+    try:
+        with open(logfile, 'rb') as f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                mm = b""  # empty log
+
+            # Merge two C-speed scans by file offset: a find() loop over the
+            # fixed-width "IN: 0x" marker for instruction addresses, and the
+            # EVENTS regex for everything else.
+            events = EVENTS.finditer(mm)
+            next_event = next(events, None)
+            pos = 0
+            while True:
+                pos = mm.find(IN_MARKER, pos)
+                # Flush events that occurred before this instruction
+                while next_event is not None and (pos < 0 or next_event.start() < pos):
+                    handle_event(next_event)
+                    next_event = next(events, None)
+                if pos < 0:
+                    break
+
+                try:
+                    addr = int(mm[pos + 6:pos + 22], 16)
+                except ValueError:
+                    pos += len(IN_MARKER)
+                    continue
+
+                i = stage_index(addr)
+                if i >= 0 and STAGE_RANGES[i][2] != current_stage:
+                    if current_stage:
+                        stage_summary()
+                    print(f"→ Entering {STAGE_RANGES[i][2]} (0x{STAGE_RANGES[i][0]:x})")
+                    current_stage = STAGE_RANGES[i][2]
+                    instruction_count = 0
+                    memory_accesses = 0
+                    exceptions = 0
+                if current_stage:
+                    instruction_count += 1
+                pos += 22
+
+    except FileNotFoundError:
+        print(f"Error: Log file '{logfile}' not found")
+        print("Make sure to run QEMU with debug logging enabled")
+        print("Usage: python3 riscv_dev.py run --debug")
+        return 1
+
+    # Final stage summary
+    if current_stage:
+        stage_summary()
+
+    print("Analysis complete!")
+    return 0
+
+if __name__ == "__main__":
+    logfile = sys.argv[1] if len(sys.argv) > 1 else 'build/logs/qemu.log'
+    sys.exit(analyze_boot_sequence(logfile))
+'''
+
 class RISCVDevelopment:
     def __init__(self):
         self.toolchain_url = "https://github.com/riscv-collab/riscv-gnu-toolchain/releases/download/2025.06.13/riscv64-elf-ubuntu-24.04-gcc-nightly-2025.06.13-nightly.tar.xz"
         self.toolchain_archive = "riscv64-elf-ubuntu-24.04-gcc-nightly-2025.06.13-nightly.tar.xz"
         self.toolchain_prefix = "riscv64-unknown-elf-"
+        self.toolchain_binaries = ["as", "ld", "objcopy", "objdump", "nm", "readelf"]
         self.components = ["bios", "stage1_bootloader", "stage2_bootloader", "kernel"]
         self.load_addresses = {
             "bios": "0x1000",
@@ -35,6 +240,25 @@ class RISCVDevelopment:
             "kernel": "0x80200000"
         }
         self.qemu_process = None
+        self._log_lock = threading.Lock()
+
+        # Preformatted log writers: one sys.stdout.write of a single string
+        # per message skips print()'s sep/end/flush handling, and a single
+        # write cannot interleave mid-line across build threads
+        red, green, yellow, blue = ("\033[0;31m", "\033[0;32m",
+                                    "\033[1;33m", "\033[0;34m")
+        reset = "\033[0m"
+        _write = sys.stdout.write
+        self.log_red = lambda m, _w=_write: _w(f"{red}{m}{reset}\n")
+        self.log_green = lambda m, _w=_write: _w(f"{green}{m}{reset}\n")
+        self.log_yellow = lambda m, _w=_write: _w(f"{yellow}{m}{reset}\n")
+        self.log_blue = lambda m, _w=_write: _w(f"{blue}{m}{reset}\n")
+        self._log_writers = {
+            "red": self.log_red,
+            "green": self.log_green,
+            "yellow": self.log_yellow,
+            "blue": self.log_blue
+        }
         
         # All generated content goes in build/
         self.build_dir = Path("build")
@@ -43,30 +267,61 @@ class RISCVDevelopment:
         self.bin_dir = self.build_dir / "bin"
         self.obj_dir = self.build_dir / "obj"
         self.logs_dir = self.build_dir / "logs"
+
+        # Prebuilt argv prefixes for the build pipeline - none of this
+        # changes after construction, so derive it once instead of per
+        # component per build
+        as_tool = str(self.bin_dir / f"{self.toolchain_prefix}as")
+        arch_flags = ["-march=rv64gc", "-mabi=lp64"]
+        self._as_debug = [as_tool, *arch_flags, "-g", "-O0"]
+        self._as_release = [as_tool, *arch_flags, "-O2"]
+        self._ld_tool = str(self.bin_dir / f"{self.toolchain_prefix}ld")
+        self._objcopy_tool = str(self.bin_dir / f"{self.toolchain_prefix}objcopy")
+        self._objdump_tool = str(self.bin_dir / f"{self.toolchain_prefix}objdump")
+        self._nm_tool = str(self.bin_dir / f"{self.toolchain_prefix}nm")
+
+        # Static part of the QEMU command line - only the debug flags vary
+        # between runs
+        self._qemu_base = (
+            "qemu-system-riscv64",
+            "-machine", "virt",
+            "-cpu", "rv64",
+            "-m", "2G",
+            "-nographic",
+            "-bios", str(self.bin_dir / "bios.bin"),
+            "-device", f"loader,file={self.bin_dir}/stage1_bootloader.bin,addr=0x80000000,force-raw=on",
+            "-device", f"loader,file={self.bin_dir}/stage2_bootloader.bin,addr=0x80100000,force-raw=on",
+            "-device", f"loader,file={self.bin_dir}/kernel.bin,addr=0x80200000,force-raw=on"
+        )
         
     def log(self, message, color="green"):
-        colors = {
-            "red": "\033[0;31m",
-            "green": "\033[0;32m", 
-            "yellow": "\033[1;33m",
-            "blue": "\033[0;34m",
-            "reset": "\033[0m"
-        }
-        print(f"{colors.get(color, '')}{message}{colors['reset']}")
+        writer = self._log_writers.get(color)
+        if writer is not None:
+            writer(message)
+        else:
+            with self._log_lock:
+                print(f"{message}\033[0m")
     
-    def run_command(self, cmd, shell=True, check=True, capture_output=False):
-        """Run a command with error handling"""
+    def run_command(self, cmd, shell=False, check=True, capture_output=False, stdout=None):
+        """Run a command (argv list) with error handling"""
         try:
             if not shell and isinstance(cmd, str):
                 cmd = cmd.split()
-            result = subprocess.run(cmd, shell=shell, check=check, 
-                                  capture_output=capture_output, text=True)
+            result = subprocess.run(cmd, shell=shell, check=check,
+                                  capture_output=capture_output, text=True,
+                                  stdout=stdout)
             return result
         except subprocess.CalledProcessError as e:
             self.log(f"Error running command: {cmd}", "red")
             if e.stderr:
                 self.log(f"Error output: {e.stderr}", "red")
             sys.exit(1)
+        except OSError as e:
+            # With shell=False a missing executable raises FileNotFoundError
+            # instead of the shell's exit 127
+            self.log(f"Error running command: {cmd}", "red")
+            self.log(f"Error output: {e}", "red")
+            sys.exit(1)
     
     def check_required_files(self):
         """Check that required source files exist"""
@@ -77,11 +332,15 @@ class RISCVDevelopment:
             "src/kernel.s"
         ]
         
-        missing_files = []
-        for file in required_files:
-            if not Path(file).exists():
-                missing_files.append(file)
-        
+        # One scandir instead of a stat syscall per file
+        try:
+            present = {entry.name for entry in os.scandir("src")}
+        except FileNotFoundError:
+            present = set()
+
+        missing_files = [file for file in required_files
+                         if Path(file).name not in present]
+
         if missing_files:
             self.log("Error: Required source files not found:", "red")
             for file in missing_files:
@@ -94,42 +353,97 @@ class RISCVDevelopment:
     
     def setup_directories(self):
         """Create all necessary directories within build/"""
-        dirs = [
-            self.build_dir,
-            self.toolchain_dir,
-            self.debug_dir,
-            self.bin_dir,
-            self.obj_dir,
-            self.logs_dir
-        ]
-        
-        for d in dirs:
-            d.mkdir(exist_ok=True, parents=True)
+        # Every other directory is a direct child of build_dir, so create the
+        # parent once and skip the per-call ancestor walk of parents=True
+        self.build_dir.mkdir(exist_ok=True)
+        for d in (self.toolchain_dir, self.debug_dir, self.bin_dir,
+                  self.obj_dir, self.logs_dir):
+            d.mkdir(exist_ok=True)
     
     def download_with_progress(self, url, filename):
-        """Download file with progress bar"""
+        """Download file with progress bar, hashing it in the same pass
+
+        Returns the SHA256 hex digest of the downloaded file, or None on
+        failure - saves re-reading a ~500 MB archive just to checksum it.
+        """
         self.log(f"Downloading {filename}...")
-        
-        def progress_hook(block_num, block_size, total_size):
-            downloaded = block_num * block_size
-            if total_size > 0:
-                percent = min(100, (downloaded * 100) // total_size)
-                print(f"\rProgress: {percent}%", end="", flush=True)
-        
+
+        digest = hashlib.sha256()
+        # Throttle progress output: re-rendering the line for every chunk is
+        # a syscall per write. On a TTY print at most every 100 ms when the
+        # percentage moves; otherwise (CI logs) one line per 10%.
+        is_tty = sys.stdout.isatty()
+        last_print = 0.0
+        last_pct = -1
         try:
-            urllib.request.urlretrieve(url, filename, progress_hook)
+            with urllib.request.urlopen(url) as response, open(filename, 'wb') as f:
+                total_size = int(response.headers.get('Content-Length', 0))
+                downloaded = 0
+                while chunk := response.read(1 << 20):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    downloaded += len(chunk)
+                    if total_size > 0:
+                        percent = min(100, (downloaded * 100) // total_size)
+                        if is_tty:
+                            now = time.monotonic()
+                            if percent != last_pct and now - last_print >= 0.1:
+                                print(f"\rProgress: {percent}%", end="", flush=True)
+                                last_pct = percent
+                                last_print = now
+                        elif percent // 10 != last_pct // 10:
+                            print(f"Progress: {percent}%", flush=True)
+                            last_pct = percent
+            if is_tty and total_size > 0:
+                print(f"\rProgress: 100%", end="")
             print()  # New line after progress
-            return True
+            return digest.hexdigest()
         except Exception as e:
             self.log(f"Error downloading {filename}: {e}", "red")
-            return False
+            return None
     
-    def install_qemu(self):
+    def _qemu_installed(self):
+        """Check whether the QEMU and GDB tools are already on PATH"""
+        return all(shutil.which(tool) for tool in
+                   ("qemu-system-riscv64", "qemu-img", "gdb-multiarch"))
+
+    def install_qemu(self, update=True):
         """Install QEMU for RISC-V"""
+        # Skip apt entirely (including the network round-trips of apt update)
+        # when everything we need is already on PATH
+        if self._qemu_installed():
+            self.log("✓ QEMU and GDB already installed, skipping apt")
+            return
+
         self.log("Installing QEMU for RISC-V...")
-        self.run_command("sudo apt update")
-        self.run_command("sudo apt install -y qemu-system-riscv64 qemu-utils gdb-multiarch")
+        # apt-get is the scriptable interface; --no-install-recommends skips
+        # the optional packages that qemu-system drags in
+        if update:
+            self.run_command(["sudo", "apt-get", "update", "-qq"])
+        self.run_command(["sudo", "apt-get", "install", "-y", "--no-install-recommends",
+                          "qemu-system-riscv64", "qemu-utils", "gdb-multiarch"])
         self.log("✓ QEMU and GDB installed successfully")
+
+    async def _prefetch(self, archive_path, download, update_apt):
+        """Run the toolchain download and apt metadata refresh concurrently
+
+        Both are network-bound and independent of each other, so overlapping
+        them in worker threads hides the apt round-trips behind the download.
+        Returns the downloaded archive's SHA256, or None when no download ran
+        (or it failed).
+        """
+        tasks = []
+        download_task = None
+        if download:
+            download_task = asyncio.ensure_future(asyncio.to_thread(
+                self.download_with_progress, self.toolchain_url, archive_path))
+            tasks.append(download_task)
+        if update_apt:
+            tasks.append(asyncio.to_thread(
+                self.run_command, ["sudo", "apt-get", "update", "-qq"]))
+        if tasks:
+            await asyncio.gather(*tasks)
+        return download_task.result() if download_task is not None else None
     
     def create_gdb_wrapper(self):
         """Create GDB wrapper script that uses system gdb-multiarch"""
@@ -143,40 +457,189 @@ class RISCVDevelopment:
         wrapper_path.chmod(0o755)
         self.log("✓ Created GDB wrapper using system gdb-multiarch")
 
+    def _archive_sha256(self, path):
+        """Compute the SHA256 of a file with a streaming read"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            while chunk := f.read(1 << 20):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _extraction_is_cached(self, archive_sha256, binaries):
+        """Check whether the binaries from this exact archive are already extracted"""
+        manifest_path = self.toolchain_dir / ".extracted.json"
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return False
+
+        if manifest.get("sha256") != archive_sha256:
+            return False
+        if set(manifest.get("binaries", [])) != set(binaries):
+            return False
+
+        for binary in binaries:
+            local_binary = self.bin_dir / f"{self.toolchain_prefix}{binary}"
+            if not local_binary.exists() or local_binary.stat().st_size == 0:
+                return False
+
+        return True
+
+    def _write_extraction_manifest(self, archive_sha256, binaries):
+        """Record which binaries were extracted from which archive"""
+        manifest_path = self.toolchain_dir / ".extracted.json"
+        with open(manifest_path, "w") as f:
+            json.dump({"sha256": archive_sha256, "binaries": binaries}, f)
+
     def extract_toolchain_binaries(self):
         """Extract specific binaries from toolchain archive"""
         self.log("Extracting RISC-V toolchain binaries...")
-        
+
         archive_path = self.toolchain_dir / self.toolchain_archive
         extract_path = self.toolchain_dir / "extracted"
-        
-        binaries = ["as", "ld", "objcopy", "objdump", "nm", "readelf"]
-        
-        with tarfile.open(archive_path, 'r:xz') as tar:
-            members = tar.getnames()
-            
-            for binary in binaries:
-                # Find the binary in the archive
-                binary_path = None
-                for member in members:
-                    if member.endswith(f"riscv/riscv64-unknown-elf/bin/{binary}"):
-                        binary_path = member
-                        break
-                
-                if binary_path:
-                    tar.extract(binary_path, extract_path)
-                    # Copy to bin directory with proper name
-                    extracted_binary = extract_path / binary_path
-                    local_binary = self.bin_dir / f"{self.toolchain_prefix}{binary}"
-                    shutil.copy2(extracted_binary, local_binary)
-                    local_binary.chmod(0o755)
-                    self.log(f"✓ Extracted {binary}")
-                else:
-                    self.log(f"Warning: {binary} not found in archive", "yellow")
-        
+
+        binaries = self.toolchain_binaries
+
+        # Prefer system tar piped through multi-threaded xz: Python's lzma
+        # decompresses single-threaded, and xz decode dominates wall time.
+        if os.name == "posix" and shutil.which("tar") and shutil.which("xz"):
+            extracted = self._extract_with_system_tar(archive_path, extract_path, binaries)
+            if extracted is not None:
+                return extracted
+
+        return self._extract_with_tarfile(archive_path, binaries)
+
+    def _extract_with_system_tar(self, archive_path, extract_path, binaries):
+        """Extract the wanted binaries with system tar and xz -T0
+
+        xz -T0 decodes a multi-stream archive on all cores. The wildcard
+        member patterns restrict extraction to the binaries we need instead
+        of writing the whole toolchain tree to disk. Returns the extracted
+        binary names, or None if tar fails (caller falls back to tarfile).
+        """
+        extract_path.mkdir(exist_ok=True)
+        cmd = ["tar", "--use-compress-program=xz -T0", "-xf", str(archive_path),
+               "-C", str(extract_path), "--wildcards", "--no-anchored"]
+        # Both archive locations of each binary: the tooldir entries are
+        # often hardlinks to the prefixed bin/ copies, and tar cannot create
+        # a hardlink whose target was excluded from extraction
+        cmd += [f"riscv/riscv64-unknown-elf/bin/{binary}" for binary in binaries]
+        cmd += [f"riscv/bin/{self.toolchain_prefix}{binary}" for binary in binaries]
+
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            self.log("System tar extraction failed, falling back to tarfile", "yellow")
+            if result.stderr:
+                self.log(result.stderr.strip(), "yellow")
+            if extract_path.exists():
+                shutil.rmtree(extract_path)
+            return None
+
+        extracted = []
+        for binary in binaries:
+            matches = (list(extract_path.glob(f"**/riscv/riscv64-unknown-elf/bin/{binary}"))
+                       or list(extract_path.glob(f"**/riscv/bin/{self.toolchain_prefix}{binary}")))
+            if matches:
+                local_binary = self.bin_dir / f"{self.toolchain_prefix}{binary}"
+                # copyfile takes the in-kernel sendfile fast path on Linux;
+                # copy2's metadata preservation is moot since we chmod anyway
+                shutil.copyfile(matches[0], local_binary)
+                local_binary.chmod(0o755)
+                self.log(f"✓ Extracted {binary}")
+                extracted.append(binary)
+            else:
+                self.log(f"Warning: {binary} not found in archive", "yellow")
+
         # Cleanup extraction directory
         if extract_path.exists():
             shutil.rmtree(extract_path)
+
+        return extracted
+
+    def _extract_with_tarfile(self, archive_path, binaries):
+        """Pure-Python extraction fallback for systems without tar/xz"""
+        # Map each wanted archive-path suffix to its binary name so a single
+        # streaming pass over the tar can match members without materializing
+        # the full member list (getnames() walks every header up front).
+        # Each binary lives in two places (binutils hardlinks the tooldir
+        # copy to the prefixed bin/ copy); matching both means the pass
+        # catches whichever occurrence carries the file data.
+        remaining = {}
+        for binary in binaries:
+            remaining[f"riscv/riscv64-unknown-elf/bin/{binary}"] = binary
+            remaining[f"riscv/bin/{self.toolchain_prefix}{binary}"] = binary
+
+        # Pipe mode ('r|...') forbids random access, so tarfile discards each
+        # header after use instead of accumulating an in-memory member index.
+        # With python-xz installed, decompression happens in its parallel
+        # block decoder and the tar layer sees plain bytes.
+        if xz is not None:
+            with xz.open(archive_path, 'rb') as decompressed, \
+                    tarfile.open(fileobj=decompressed, mode='r|') as tar:
+                self._extract_wanted_members(tar, remaining)
+        else:
+            with tarfile.open(archive_path, 'r|xz') as tar:
+                self._extract_wanted_members(tar, remaining)
+
+        missing = set(remaining.values())
+        for binary in missing:
+            self.log(f"Warning: {binary} not found in archive", "yellow")
+
+        return [b for b in binaries if b not in missing]
+
+    def _extract_wanted_members(self, tar, remaining):
+        """Single streaming pass extracting every suffix-matched member
+
+        Regular members stream straight to their destination. Hardlink
+        members (binutils links the tooldir and prefixed copies together)
+        carry no data, and in pipe mode the stream cannot seek back to the
+        target - so remember where each extracted member went and satisfy
+        links by copying the already-extracted target.
+        """
+        def norm(name):
+            return name[2:] if name.startswith("./") else name
+
+        seen = {}  # normalized member name -> extracted destination
+        for member in tar:
+            probes = [member.name]
+            if member.islnk():
+                probes.append(member.linkname)
+
+            matched = None
+            for probe in probes:
+                for suffix in remaining:
+                    if probe.endswith(suffix):
+                        matched = suffix
+                        break
+                if matched:
+                    break
+
+            if matched is None:
+                continue
+
+            binary = remaining[matched]
+            local_binary = self.bin_dir / f"{self.toolchain_prefix}{binary}"
+            if member.isreg():
+                # Stream the member straight to its destination - no
+                # intermediate extracted/ tree to write, copy, and rmtree.
+                with tar.extractfile(member) as src, open(local_binary, 'wb') as dst:
+                    shutil.copyfileobj(src, dst, length=1 << 20)
+            elif member.islnk() and norm(member.linkname) in seen:
+                shutil.copyfile(seen[norm(member.linkname)], local_binary)
+            else:
+                continue  # link target not extracted (yet); keep scanning
+
+            seen[norm(member.name)] = local_binary
+            local_binary.chmod(0o755)
+            self.log(f"✓ Extracted {binary}")
+
+            # Drop the binary's other archive location as well
+            for suffix in [s for s, b in remaining.items() if b == binary]:
+                del remaining[suffix]
+
+            if not remaining:
+                break
     
     def install(self):
         """Install all required tools and dependencies"""
@@ -185,17 +648,33 @@ class RISCVDevelopment:
         # Setup directory structure
         self.setup_directories()
         
-        # Download toolchain if not present
+        # Download the toolchain (if not present, hashing it as it streams
+        # in) concurrently with the apt metadata refresh (if needed) - both
+        # are network-bound and independent
         archive_path = self.toolchain_dir / self.toolchain_archive
-        if not archive_path.exists():
-            if not self.download_with_progress(self.toolchain_url, archive_path):
+        need_download = not archive_path.exists()
+        need_apt = not self._qemu_installed()
+        archive_sha256 = asyncio.run(
+            self._prefetch(archive_path, need_download, need_apt))
+        if need_download and archive_sha256 is None:
+            return False
+
+        # Extract toolchain binaries, unless this exact archive was already
+        # extracted (manifest hash matches and all binaries are in place)
+        if archive_sha256 is None:
+            archive_sha256 = self._archive_sha256(archive_path)
+        if self._extraction_is_cached(archive_sha256, self.toolchain_binaries):
+            self.log("✓ Toolchain binaries already extracted, skipping")
+        else:
+            extracted = self.extract_toolchain_binaries()
+            if not extracted:
+                self.log("Error: no toolchain binaries could be extracted "
+                         "from the archive", "red")
                 return False
+            self._write_extraction_manifest(archive_sha256, extracted)
         
-        # Extract toolchain binaries
-        self.extract_toolchain_binaries()
-        
-        # Install QEMU
-        self.install_qemu()
+        # Install QEMU (apt metadata was already refreshed by the prefetch)
+        self.install_qemu(update=False)
 
         # Create GDB wrapper since it's not in the release
         self.create_gdb_wrapper()
@@ -209,223 +688,177 @@ class RISCVDevelopment:
         self.log("4. Run: python3 riscv_dev.py run --debug", "blue")
         return True
     
-    def build_component(self, name, debug=False):
-        """Build a single component"""
+    def _component_stages(self, name, debug=False):
+        """Staged build commands for one component as (argv, stdout_path) tuples
+
+        Stage k must finish before stage k+1 of the same component starts,
+        but the same stage across different components is independent.
+        """
         source_file = f"src/{name}.s"
         load_addr = self.load_addresses[name]
-        
-        if not Path(source_file).exists():
-            self.log(f"Error: {source_file} not found", "red")
-            return False
-        
-        arch_flags = "-march=rv64gc -mabi=lp64"
-        debug_flags = "-g -O0" if debug else "-O2"
-        
-        # All tools are in build/bin/
-        as_tool = self.bin_dir / f"{self.toolchain_prefix}as"
-        ld_tool = self.bin_dir / f"{self.toolchain_prefix}ld"
-        objcopy_tool = self.bin_dir / f"{self.toolchain_prefix}objcopy"
-        
+        as_prefix = self._as_debug if debug else self._as_release
+
         # Object file goes in build/obj/
-        obj_file = self.obj_dir / f"{name}.o"
+        obj_file = str(self.obj_dir / f"{name}.o")
         # Final outputs go in build/bin/
-        elf_file = self.bin_dir / f"{name}.elf"
-        bin_file = self.bin_dir / f"{name}.bin"
-        
-        # Assemble
-        as_cmd = f"{as_tool} {arch_flags} {debug_flags} {source_file} -o {obj_file}"
-        self.run_command(as_cmd)
-        
-        # Link
-        ld_cmd = f"{ld_tool} -Ttext={load_addr} --oformat=elf64-littleriscv {obj_file} -o {elf_file}"
-        self.run_command(ld_cmd)
-        
-        # Create binary
-        objcopy_cmd = f"{objcopy_tool} -O binary {elf_file} {bin_file}"
-        self.run_command(objcopy_cmd)
-        
+        elf_file = str(self.bin_dir / f"{name}.elf")
+        bin_file = str(self.bin_dir / f"{name}.bin")
+
+        stages = [
+            ([*as_prefix, source_file, "-o", obj_file], None),
+            ([self._ld_tool, f"-Ttext={load_addr}", "--oformat=elf64-littleriscv",
+              obj_file, "-o", elf_file], None),
+            ([self._objcopy_tool, "-O", "binary", elf_file, bin_file], None),
+        ]
+
         if debug:
-            # Generate debug files in build/debug/
-            objdump_tool = self.bin_dir / f"{self.toolchain_prefix}objdump"
-            nm_tool = self.bin_dir / f"{self.toolchain_prefix}nm"
-            
-            disasm_file = self.debug_dir / f"{name}_disasm.txt"
-            symbols_file = self.debug_dir / f"{name}_symbols.txt"
-            
-            self.run_command(f"{objdump_tool} -D {elf_file} > {disasm_file}")
-            self.run_command(f"{nm_tool} {elf_file} > {symbols_file}")
-        
+            # Debug files go in build/debug/
+            stages.append(([self._objdump_tool, "-D", elf_file],
+                           self.debug_dir / f"{name}_disasm.txt"))
+            stages.append(([self._nm_tool, elf_file],
+                           self.debug_dir / f"{name}_symbols.txt"))
+
+        return stages
+
+    def build_component(self, name, debug=False):
+        """Build a single component"""
+        if not Path(f"src/{name}.s").exists():
+            self.log(f"Error: src/{name}.s not found", "red")
+            return False
+
+        for argv, stdout_path in self._component_stages(name, debug):
+            if stdout_path is None:
+                self.run_command(argv)
+            else:
+                with open(stdout_path, "w") as out:
+                    self.run_command(argv, stdout=out)
+
         self.log(f"✓ Built {name}")
         return True
-    
-    def create_gdb_script(self):
-        """Create GDB initialization script in build/debug/"""
-        gdb_script = f"""
-# GDB script for RISC-V boot chain debugging
-target remote localhost:1234
 
-# Load symbols from build/bin/
-symbol-file {self.bin_dir}/bios.elf
-add-symbol-file {self.bin_dir}/stage1_bootloader.elf 0x80000000
-add-symbol-file {self.bin_dir}/stage2_bootloader.elf 0x80100000
-add-symbol-file {self.bin_dir}/kernel.elf 0x80200000
+    def _run_build_waves(self, debug, max_workers):
+        """Run each build stage as a wave of concurrent child processes
 
-# Set breakpoints at key locations
-break *0x1000        # BIOS entry
-break *0x80000000    # Stage-1 bootloader entry
-break *0x80100000    # Stage-2 bootloader entry
-break *0x80200000    # Kernel entry
+        All `as` invocations launch together, then all `ld`, then all
+        `objcopy` (plus objdump/nm waves in debug mode). Plain Popen with
+        default arguments keeps CPython on its posix_spawn fast path, so a
+        wave is N cheap spawns followed by one barrier of wait()s.
+        """
+        stages = {name: self._component_stages(name, debug) for name in self.components}
+        stage_count = max(len(s) for s in stages.values())
+        failed = set()
 
-# Set breakpoints at symbolic locations (if debug symbols exist)
-break stage2_entry
-break stage2_sbi_call
-break stage2_kernel_jump
+        for stage in range(stage_count):
+            wave = [(name, *stages[name][stage]) for name in self.components
+                    if name not in failed and stage < len(stages[name])]
 
-# Custom debugging commands
-define show-boot-state
-    printf "=== Boot State Debug ===\\n"
-    printf "PC: 0x%016lx\\n", $pc
-    printf "SP: 0x%016lx\\n", $sp
-    printf "mstatus: 0x%016lx\\n", $mstatus
-    if ($pc >= 0x1000) && ($pc < 0x80000000)
-        printf "Current stage: BIOS\\n"
-    end
-    if ($pc >= 0x80000000) && ($pc < 0x80100000)
-        printf "Current stage: Stage-1 Bootloader\\n"
-    end
-    if ($pc >= 0x80100000) && ($pc < 0x80200000)
-        printf "Current stage: Stage-2 Bootloader\\n"
-    end
-    if ($pc >= 0x80200000)
-        printf "Current stage: Kernel\\n"
-    end
-    printf "========================\\n"
-end
+            for start in range(0, len(wave), max_workers):
+                procs = []
+                for name, argv, stdout_path in wave[start:start + max_workers]:
+                    out = open(stdout_path, "w") if stdout_path else None
+                    try:
+                        proc = subprocess.Popen(argv, stdout=out)
+                    except OSError as e:
+                        # Missing toolchain binary (e.g. build before install)
+                        if out:
+                            out.close()
+                        self.log(f"Error running command: {argv}", "red")
+                        self.log(f"Error output: {e}", "red")
+                        failed.add(name)
+                        continue
+                    procs.append((name, argv, proc, out))
+                for name, argv, proc, out in procs:
+                    returncode = proc.wait()
+                    if out:
+                        out.close()
+                    if returncode != 0:
+                        self.log(f"Error running command: {argv}", "red")
+                        failed.add(name)
 
-define step-boot
-    stepi
-    show-boot-state
-end
+        for name in self.components:
+            if name not in failed:
+                self.log(f"✓ Built {name}")
 
-# Enable useful debugging features
-set disassemble-next-line on
-set print pretty on
-set confirm off
-
-# Print startup message
-echo \\n=== RISC-V Boot Chain Debugger ===\\n
-echo Available commands:\\n
-echo   show-boot-state : Show current boot state\\n
-echo   step-boot      : Step one instruction and show state\\n
-echo   continue       : Continue execution\\n
-echo ===================================\\n\\n
-"""
-        gdb_script_path = self.debug_dir / "gdb_init.gdb"
-        with open(gdb_script_path, "w") as f:
-            f.write(gdb_script)
+        return not failed
     
-    def create_trace_script(self):
-        """Create trace analysis script in build/debug/"""
-        trace_script = '''#!/usr/bin/env python3
-"""
-QEMU Trace Analysis Script for RISC-V Boot Chain
-Analyzes QEMU execution logs to provide boot sequence insights
-"""
+    def _write_if_changed(self, path, content):
+        """Write content to path, skipping the write if it is already current
 
-import sys
-import re
-from pathlib import Path
+        Leaving an up-to-date file untouched preserves its mtime for
+        mtime-driven incremental tools.
+        """
+        data = content.encode()
+        digest = hashlib.sha256(data).digest()
+        if path.exists() and hashlib.sha256(path.read_bytes()).digest() == digest:
+            return
+        path.write_bytes(data)
 
-def analyze_boot_sequence(logfile):
-    print("=== RISC-V Boot Sequence Analysis ===\\n")
-    
-    stages = {
-        0x1000: "BIOS",
-        0x80000000: "Stage-1 Bootloader", 
-        0x80100000: "Stage-2 Bootloader",
-        0x80200000: "Kernel"
-    }
-    
-    current_stage = None
-    instruction_count = 0
-    memory_accesses = 0
-    exceptions = []
-    
-    try:
-        with open(logfile, 'r') as f:
-            for line_num, line in enumerate(f, 1):
-                # Track stage transitions
-                for addr, stage_name in stages.items():
-                    if f"IN: 0x{addr:016x}" in line:
-                        if current_stage != stage_name:
-                            if current_stage:
-                                print(f"  Instructions executed: {instruction_count}")
-                                print(f"  Memory accesses: {memory_accesses}")
-                                if exceptions:
-                                    print(f"  Exceptions: {len(exceptions)}")
-                                print()
-                            print(f"→ Entering {stage_name} (0x{addr:x})")
-                            current_stage = stage_name
-                            instruction_count = 0
-                            memory_accesses = 0
-                            exceptions = []
-                        break
-                
-                # Count instructions and memory accesses
-                if current_stage and "IN:" in line:
-                    instruction_count += 1
-                elif current_stage and ("load" in line.lower() or "store" in line.lower()):
-                    memory_accesses += 1
-                
-                # Track important events
-                if "exception" in line.lower():
-                    exception_info = f"Line {line_num}: {line.strip()}"
-                    exceptions.append(exception_info)
-                    print(f"  ⚠️  Exception in {current_stage}: {line.strip()}")
-                elif "interrupt" in line.lower():
-                    print(f"  📶 Interrupt in {current_stage}: {line.strip()}")
-                    
-    except FileNotFoundError:
-        print(f"Error: Log file '{logfile}' not found")
-        print("Make sure to run QEMU with debug logging enabled")
-        print("Usage: python3 riscv_dev.py run --debug")
-        return 1
-    
-    # Final stage summary
-    if current_stage:
-        print(f"  Instructions executed: {instruction_count}")
-        print(f"  Memory accesses: {memory_accesses}")
-        if exceptions:
-            print(f"  Exceptions: {len(exceptions)}")
-        print()
-    
-    print("Analysis complete!")
-    return 0
+    def create_gdb_script(self):
+        """Create GDB initialization script in build/debug/"""
+        gdb_script = _GDB_TEMPLATE.format(bin_dir=self.bin_dir)
+        self._write_if_changed(self.debug_dir / "gdb_init.gdb", gdb_script)
 
-if __name__ == "__main__":
-    logfile = sys.argv[1] if len(sys.argv) > 1 else 'build/logs/qemu.log'
-    sys.exit(analyze_boot_sequence(logfile))
-'''
-        
+    def create_trace_script(self):
+        """Create trace analysis script in build/debug/"""
         trace_script_path = self.debug_dir / "trace_memory.py"
-        with open(trace_script_path, "w") as f:
-            f.write(trace_script)
+        self._write_if_changed(trace_script_path, _TRACE_TEMPLATE)
         trace_script_path.chmod(0o755)
     
+    def _acquire_jobserver_tokens(self, wanted):
+        """Acquire extra job tokens from a GNU make jobserver, if one is active
+
+        When this script runs under `make -jN`, MAKEFLAGS carries
+        --jobserver-auth=R,W (or the older --jobserver-fds) naming the token
+        pipe. Each extra worker beyond the one implicit slot needs a token,
+        which must be written back once the work is done. Returns
+        (tokens, write_fd) or None when no jobserver is available.
+        """
+        match = re.search(r"--jobserver-(?:auth|fds)=(\d+),(\d+)",
+                          os.environ.get("MAKEFLAGS", ""))
+        if not match:
+            return None
+        read_fd, write_fd = int(match.group(1)), int(match.group(2))
+        tokens = b""
+        try:
+            # The token pipe is shared with make and every sibling job, so
+            # O_NONBLOCK must be restored once we are done reading - it is a
+            # property of the open file description, not of our fd.
+            was_blocking = os.get_blocking(read_fd)
+            os.set_blocking(read_fd, False)
+            try:
+                tokens = os.read(read_fd, wanted)
+            except BlockingIOError:
+                pass
+            finally:
+                if was_blocking:
+                    os.set_blocking(read_fd, True)
+        except OSError:
+            return None
+        return tokens, write_fd
+
     def build(self, debug=False):
         """Build all components"""
         self.log(f"=== Building RISC-V Boot Chain {'(Debug Mode)' if debug else ''} ===", "blue")
-        
+
         # Check that source files exist
         if not self.check_required_files():
             return False
-        
+
         self.setup_directories()
-        
-        success = True
-        for component in self.components:
-            if not self.build_component(component, debug):
-                success = False
+
+        # Components are independent, so run each build stage as a wave of
+        # concurrent child processes, bounded by the jobserver when present.
+        max_workers = min(len(self.components), os.cpu_count() or 1)
+        jobserver = self._acquire_jobserver_tokens(max_workers - 1)
+        if jobserver is not None:
+            tokens, jobserver_write_fd = jobserver
+            max_workers = 1 + len(tokens)
+
+        try:
+            success = self._run_build_waves(debug, max_workers)
+        finally:
+            if jobserver is not None and tokens:
+                os.write(jobserver_write_fd, tokens)
         
         if debug:
             self.create_gdb_script()
@@ -444,18 +877,8 @@ if __name__ == "__main__":
     
     def start_qemu(self, debug=False):
         """Start QEMU with the boot chain"""
-        cmd = [
-            "qemu-system-riscv64",
-            "-machine", "virt",
-            "-cpu", "rv64",
-            "-m", "2G", 
-            "-nographic",
-            "-bios", str(self.bin_dir / "bios.bin"),
-            "-device", f"loader,file={self.bin_dir}/stage1_bootloader.bin,addr=0x80000000,force-raw=on",
-            "-device", f"loader,file={self.bin_dir}/stage2_bootloader.bin,addr=0x80100000,force-raw=on",
-            "-device", f"loader,file={self.bin_dir}/kernel.bin,addr=0x80200000,force-raw=on"
-        ]
-        
+        cmd = list(self._qemu_base)
+
         if debug:
             log_file = self.logs_dir / "qemu.log"
             cmd.extend([
@@ -470,6 +893,62 @@ if __name__ == "__main__":
         
         return subprocess.Popen(cmd)
     
+    def watch(self, debug=False):
+        """Rebuild components as their sources change
+
+        One long-lived Python process amortizes interpreter startup and
+        class construction across every rebuild; each source edit costs
+        only the subprocess spawns for its own component.
+        """
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            self.log("Error: the watch command requires the watchdog package", "red")
+            self.log("Install it with: pip install watchdog", "yellow")
+            return False
+
+        # Full build up front so every component is current before watching
+        if not self.build(debug):
+            return False
+
+        dev = self
+        sources = {f"{name}.s": name for name in self.components}
+
+        class RebuildHandler(FileSystemEventHandler):
+            def _rebuild(self, path):
+                name = sources.get(Path(path).name)
+                if name is None:
+                    return
+                try:
+                    dev.build_component(name, debug)
+                except SystemExit:
+                    pass  # keep watching after a failed build
+
+            def on_modified(self, event):
+                self._rebuild(event.src_path)
+
+            on_created = on_modified
+
+            def on_moved(self, event):
+                # Editors often save via write-to-temp + rename
+                self._rebuild(event.dest_path)
+
+        observer = Observer()
+        observer.schedule(RebuildHandler(), "src")
+        observer.start()
+        self.log("Watching src/ for changes (Ctrl-C to stop)...", "blue")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            self.log("Stopped watching", "yellow")
+        finally:
+            observer.stop()
+            observer.join()
+
+        return True
+
     def run(self, debug=False):
         """Run the boot chain in QEMU"""
         self.log(f"=== Running RISC-V Boot Chain {'(Debug Mode)' if debug else ''} ===", "blue")
@@ -518,6 +997,10 @@ def main():
     build_parser = subparsers.add_parser("build", help="Build boot chain components")
     build_parser.add_argument("--debug", action="store_true", help="Build with debug information")
     
+    # Watch command
+    watch_parser = subparsers.add_parser("watch", help="Rebuild components when sources change")
+    watch_parser.add_argument("--debug", action="store_true", help="Build with debug information")
+
     # Run command
     run_parser = subparsers.add_parser("run", help="Run boot chain in QEMU")
     run_parser.add_argument("--debug", action="store_true", help="Run with debug support")
@@ -534,6 +1017,8 @@ def main():
         return 0 if dev.install() else 1
     elif args.command == "build":
         return 0 if dev.build(debug=args.debug) else 1
+    elif args.command == "watch":
+        return 0 if dev.watch(debug=args.debug) else 1
     elif args.command == "run":
         return 0 if dev.run(debug=args.debug) else 1
     